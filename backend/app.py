@@ -1,20 +1,56 @@
-from flask import Flask, request, jsonify
-from db import supabase
-from ml_service import predict_growth
+from flask import Flask, Response, request, jsonify, stream_with_context
+from db import supabase, iter_table, select_in, POSTGREST_MAX_ROWS
+from matching import StartupIndex, INDEX_COLUMNS
+from portfolio import PortfolioAggregates
+from columns import ML_COLUMNS, startup_columns_mapping
+from ml_service import predict_growth, drift_monitor, batcher, PredictionTimeoutError
 from blockchain import invest_on_chain
 from werkzeug.security import generate_password_hash, check_password_hash
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
 import uuid
 import datetime
+import csv
+import io
+import json
+import itertools
 
 app = Flask(__name__)
 
+# ---------------- Startup Matching Index ----------------
+# Built once from the startups table on first use, then updated as startups are onboarded.
+startup_index = StartupIndex()
+
+def get_startup_index():
+    return startup_index.load_once(lambda: iter_table("startups", "startup_id", columns=INDEX_COLUMNS))
+
+# ---------------- Portfolio Aggregates ----------------
+# Rebuilt from the investments ledger on first use, then updated on every /invest/trigger.
+portfolios = PortfolioAggregates()
+
 # ---------------- Health Check ----------------
 @app.route("/", methods=["GET"])
 def health_check():
     return jsonify({"status": "running", "message": "Backend is active and model is loaded."})
 
+# ---------------- Model Monitoring ----------------
+@app.route("/model/drift", methods=["GET"])
+def model_drift():
+    # Served from in-memory sketches updated on every prediction; no DB access
+    if drift_monitor is None:
+        return jsonify({"error": "No drift profile. Re-run 'python train_model.py' to generate it."}), 404
+    return jsonify(drift_monitor.report())
+
+@app.route("/model/drift/reset", methods=["POST"])
+def reset_model_drift():
+    if drift_monitor is None:
+        return jsonify({"error": "No drift profile. Re-run 'python train_model.py' to generate it."}), 404
+    drift_monitor.reset()
+    return jsonify({"message": "Drift counters reset"})
+
+@app.route("/model/batching", methods=["GET"])
+def model_batching():
+    # Batch size / wait-time metrics of the prediction coalescer
+    return jsonify(batcher.metrics())
+
 # ---------------- Authentication ----------------
 @app.route("/auth/register", methods=["POST"])
 def register():
@@ -53,47 +89,21 @@ def onboard_startup():
         return jsonify({"error": "user_id missing"}), 400
 
     # 🔹 Prepare ML input (only model-used columns)
-    ml_columns = [
-        "Domain",
-        "Startup_Stage",
-        "Industry_Funder_Type",
-        "Investment_Amount",
-        "Valuation",
-        "Number_of_Investors",
-        "Year_Founded"
-    ]
-
-    ml_input = {col: data[col] for col in ml_columns if col in data}
+    ml_input = {col: data[col] for col in ML_COLUMNS if col in data}
 
     # 🔹 Predict growth class + SHAP
-    growth_class, shap_summary = predict_growth(ml_input)
+    try:
+        growth_class, shap_summary = predict_growth(ml_input)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except PredictionTimeoutError as e:
+        return jsonify({"error": f"Prediction service busy: {e}"}), 503
 
     startup_id = str(uuid.uuid4())
     data["User_ID"] = user_id 
     data["Growth_Class"] = growth_class
 
-    # 🔹 Insert startup into DB (PascalCase schema)
-        # Map PascalCase keys to lowercase DB columns
-    startup_columns_mapping = {
-        "Startup_ID": "startup_id",
-        "User_ID": "user_id",
-        "Startup_Idea": "startup_idea",
-        "Domain": "domain",
-        "Startup_Stage": "startup_stage",
-        "Industry_Funder_Type": "industry_funder_type",
-        "Project_Duration_Months": "project_duration_months",
-        "SDG_Alignment": "sdg_alignment",
-        "Investment_Amount": "investment_amount",
-        "Valuation": "valuation",
-        "Number_of_Investors": "number_of_investors",
-        "Year_Founded": "year_founded",
-        "Growth_Rate_Cent": "growth_rate_cent",
-        "Country": "country",
-        "Growth_Class": "growth_class",
-        "Project_Status": "project_status",
-        "Funding_Rounds": "funding_rounds"
-    }
-
+    # 🔹 Insert startup into DB (PascalCase keys -> lowercase DB columns)
     db_data = {startup_columns_mapping[k]: data[k] for k in startup_columns_mapping if k in data}
 
     try:
@@ -102,6 +112,13 @@ def onboard_startup():
     except Exception as e:
         print(f"Database Error: {e}")
         return jsonify({"error": "Failed to save startup data"}), 500
+
+    # 🔹 Index for recommendations. Always upsert, even during the first load: its keyset scan may
+    # already be past this random startup_id. The row is saved either way, so don't fail the request.
+    try:
+        startup_index.add(result.data[0])
+    except Exception as e:
+        print(f"Startup index error: {e}")
     # 🔹 Save SHAP results (lowercase startup_id column)
     for feature_name, shap_val in shap_summary:
         supabase.table("shap_results").insert({
@@ -118,6 +135,12 @@ def onboard_startup():
 
 
 
+@app.route("/startup/index/refresh", methods=["POST"])
+def refresh_startup_index():
+    # Picks up startups written outside this process (e.g. by bulk_import.py)
+    indexed = startup_index.refresh(iter_table("startups", "startup_id", columns=INDEX_COLUMNS))
+    return jsonify({"message": "Startup index refreshed", "indexed": indexed})
+
 # ---------------- Investor Profile ----------------
 @app.route("/investor/profile", methods=["POST"])
 def create_investor_profile():
@@ -145,41 +168,32 @@ def create_investor_profile():
 @app.route("/investor/recommend", methods=["POST"])
 def recommend():
     prefs = request.json
-    startups = supabase.table("startups").select("*").execute().data
-
-    # Step A: Rule-Based Filtering
-    filtered = [
-        s for s in startups
-        if s["valuation"] >= prefs.get("min_valuation", 0)
-        and s["valuation"] <= prefs.get("max_valuation", float('inf'))
-        and s.get("growth_rate_cent", 0) >= prefs.get("min_growth_rate", 0)
-        and (not prefs.get("domain") or s["domain"] == prefs.get("domain"))
-    ]
-
-    if not filtered:
-        return jsonify([])
 
-    # Step B: Similarity-Based Ranking (Cosine Similarity)
-    # Vector: [1 - Normalized_Valuation, Normalized_Growth_Rate] to favor low valuation and high growth.
-    max_val = max(s["valuation"] for s in filtered) or 1
-    max_growth = max(s.get("growth_rate_cent", 0) for s in filtered) or 1
-
-    # Investor's ideal vector represents a preference for lowest valuation and highest growth.
-    investor_vec = np.array([[1, 1]])
+    # Stored investor profile fills in anything the request doesn't specify
+    investor_id = prefs.get("investor_id") or prefs.get("user_id")
+    if investor_id:
+        profile = supabase.table("investors").select("*").eq("investor_id", investor_id).execute().data
+        if profile:
+            stored = {k: v for k, v in profile[0].items() if v not in (None, "")}
+            prefs = dict(stored, **{k: v for k, v in prefs.items() if v not in (None, "")})
+
+    # Filtered k-NN over domain, stage, funder type, SDG alignment, investment amount,
+    # number of investors and year founded, ranked towards low valuation / high growth (see matching.py)
+    matches = get_startup_index().query(prefs, k=5)
+    if not matches:
+        return jsonify([])
 
-    scored_startups = []
-    for s in filtered:
-        startup_vec = np.array([[
-            1 - (s["valuation"] / max_val), # Invert valuation score
-            s.get("growth_rate_cent", 0) / max_growth
-        ]])
-        
-        similarity = cosine_similarity(investor_vec, startup_vec)[0][0]
-        s["match_score"] = float(similarity)
-        scored_startups.append(s)
+    # The index only holds ids and features: fetch the full rows for the top 5
+    rows = supabase.table("startups").select("*").in_("startup_id", [sid for sid, _ in matches]).execute().data
+    by_id = {row["startup_id"]: row for row in rows}
 
-    # Return Top 5
-    top5 = sorted(scored_startups, key=lambda x: x["match_score"], reverse=True)[:5]
+    top5 = []
+    for startup_id, score in matches:
+        if startup_id not in by_id:
+            continue
+        s = by_id[startup_id]
+        s["match_score"] = score
+        top5.append(s)
 
     return jsonify(top5)
 
@@ -216,15 +230,111 @@ def trigger_investment():
 
     # 🔹 Insert into DB safely
     try:
-        supabase.table("investments").insert(investment_record).execute()
+        result = supabase.table("investments").insert(investment_record).execute()
     except Exception as e:
         return jsonify({"error": f"Database insertion failed: {e}"}), 500
 
+    # 🔹 Update portfolio aggregates from the stored row (DB created_at, same as a rebuild sees)
+    investment_row = result.data[0] if result.data else investment_record
+    startup = startup_index.get(startup_id)
+    if startup is None:
+        rows = supabase.table("startups").select("startup_id,domain,growth_class").eq("startup_id", startup_id).execute().data
+        startup = rows[0] if rows else None
+    portfolios.record(investment_row, startup)
+
     return jsonify({
         "message": "Investment recorded successfully",
         "tx_hash": tx_hash
     })
     
+# ---------------- Portfolios ----------------
+@app.route("/portfolio/investor/<investor_id>", methods=["GET"])
+def investor_portfolio(investor_id):
+    summary = portfolios.load_once().investor_summary(investor_id)
+    if summary is None:
+        return jsonify({"error": "No investments found for investor"}), 404
+    return jsonify(summary)
+
+@app.route("/portfolio/startup/<startup_id>", methods=["GET"])
+def startup_portfolio(startup_id):
+    summary = portfolios.load_once().startup_summary(startup_id)
+    if summary is None:
+        return jsonify({"error": "No investments found for startup"}), 404
+    return jsonify(summary)
+
+@app.route("/portfolio/rebuild", methods=["POST"])
+def rebuild_portfolio():
+    # Recompute every aggregate from the investments ledger
+    count = portfolios.rebuild()
+    return jsonify({"message": "Portfolio aggregates rebuilt", "investments": count})
+
+# ---------------- Export ----------------
+# predict_growth stores the top 5 SHAP features per startup. Size startup pages so one page's SHAP
+# rows fit under the max-rows cap, and keep the startup_id IN (...) list in the URL short (~3.7KB)
+SHAP_FEATURES_PER_STARTUP = 5
+EXPORT_PAGE_SIZE = min(100, POSTGREST_MAX_ROWS // SHAP_FEATURES_PER_STARTUP)
+
+@app.route("/startups/export", methods=["GET"])
+def export_startups():
+    # Streams startups joined with their SHAP features as NDJSON (default) or CSV.
+    # Pages through the DB with keyset pagination, so memory stays flat regardless of table size.
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+
+    filters = {
+        column: request.args[arg]
+        for arg, column in (("domain", "domain"), ("stage", "startup_stage"), ("growth_class", "growth_class"))
+        if request.args.get(arg)
+    }
+
+    def rows_with_shap():
+        startups = iter_table("startups", "startup_id", page_size=EXPORT_PAGE_SIZE, filters=filters)
+        while True:
+            page = list(itertools.islice(startups, EXPORT_PAGE_SIZE))
+            if not page:
+                return
+            # shap_results for the whole page, paged in case it exceeds the max-rows cap
+            shap = {}
+            ids = [s["startup_id"] for s in page]
+            shap_rows = select_in(
+                "shap_results", "startup_id", ids,
+                columns="startup_id,feature,shap_value", order=("startup_id", "feature", "shap_value"),
+            )
+            for r in shap_rows:
+                shap.setdefault(r["startup_id"], []).append({"feature": r["feature"], "shap_value": r["shap_value"]})
+            for s in page:
+                s["shap_features"] = sorted(shap.get(s["startup_id"], []), key=lambda f: abs(f["shap_value"]), reverse=True)
+                yield s
+
+    def ndjson():
+        for row in rows_with_shap():
+            yield json.dumps(row, default=str) + "\n"
+
+    def csv_rows():
+        columns = list(startup_columns_mapping.values()) + ["shap_features"]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        # Send the header straight away so an export with no matching rows is still a valid CSV
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        for row in rows_with_shap():
+            row["shap_features"] = json.dumps(row["shap_features"])
+            writer.writerow([row.get(c) for c in columns])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if fmt == "csv":
+        return Response(
+            stream_with_context(csv_rows()),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=startups.csv"},
+        )
+    return Response(stream_with_context(ndjson()), mimetype="application/x-ndjson")
+
 
 if __name__ == "__main__":
     app.run(debug=True)
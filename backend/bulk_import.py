@@ -0,0 +1,239 @@
+# bulk_import.py
+# Streams a startup dataset (CSV or XLSX, e.g. model/ready_data.csv) into the DB:
+# read a chunk -> predict growth class + SHAP for the whole chunk -> bulk insert startups and shap_results.
+#
+# Usage:
+#   python bulk_import.py ../model/ready_data.csv --user-id <uuid>
+#   python bulk_import.py data.xlsx --user-id <uuid> --chunk-size 5000 --restart
+#   python bulk_import.py ../model/ready_data.csv --user-id <uuid> --api http://127.0.0.1:5000
+#
+# Progress is checkpointed to "<file>.checkpoint.json" after every written batch, so re-running the
+# same command after a failure resumes from the first row that was not yet written.
+# Writes are idempotent: startup_id is derived from the dataset Startup_ID (uuid5) and upserted, and a
+# startup's shap_results are replaced rather than appended, so a batch that is retried or re-run after
+# a crash never produces duplicates.
+#
+# The running API keeps an in-memory startup index for /investor/recommend. Pass --api to refresh it
+# when the import finishes, or POST <api>/startup/index/refresh yourself; otherwise imported startups
+# only show up in recommendations after the server restarts.
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import requests
+import pandas as pd
+from db import supabase
+from columns import ML_COLUMNS, startup_columns_mapping
+from ml_service import predict_growth_batch
+
+DEFAULT_CHUNK_SIZE = 2000
+INSERT_BATCH_SIZE = 500
+MAX_PENDING_CHUNKS = 2      # reader blocks once this many chunks are waiting to be written
+MAX_RETRIES = 3
+SHAP_DELETE_BATCH_SIZE = 100    # keeps the startup_id IN (...) list in the URL short
+# Namespace for deterministic startup_ids derived from dataset Startup_IDs
+STARTUP_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "teamhawks/startups")
+
+
+# ---------------- Reading ----------------
+def iter_chunks(path, chunk_size, skip_rows=0):
+    """Yield (first_row_number, DataFrame) chunks without loading the whole file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        reader = pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, skip_rows + 1))
+        start = skip_rows
+        for chunk in reader:
+            yield start, chunk
+            start += len(chunk)
+    elif ext in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows)]
+            start, buffer = skip_rows, []
+            for row_number, row in enumerate(rows):
+                if row_number < skip_rows:
+                    continue
+                buffer.append(row)
+                if len(buffer) == chunk_size:
+                    yield start, pd.DataFrame(buffer, columns=header)
+                    start, buffer = start + len(buffer), []
+            if buffer:
+                yield start, pd.DataFrame(buffer, columns=header)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported file type: {ext} (expected .csv or .xlsx)")
+
+
+# ---------------- Checkpoints ----------------
+def checkpoint_path(path):
+    return f"{path}.checkpoint.json"
+
+
+def load_checkpoint(path):
+    """Return (rows_done, stats) from the checkpoint, or (0, fresh stats) when there is none."""
+    cp_path = checkpoint_path(path)
+    if not os.path.exists(cp_path):
+        return 0, {"inserted": 0, "skipped": 0}
+    with open(cp_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("size") != os.path.getsize(path):
+        raise RuntimeError(
+            f"{path} changed since the checkpoint was written.\n"
+            "Re-run with --restart to import it from the beginning."
+        )
+    return checkpoint["rows_done"], {
+        "inserted": checkpoint.get("inserted", 0),
+        "skipped": checkpoint.get("skipped", 0),
+    }
+
+
+def save_checkpoint(path, rows_done, stats):
+    # Write-then-rename so a crash never leaves a half-written checkpoint behind
+    cp_path = checkpoint_path(path)
+    tmp_path = cp_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"size": os.path.getsize(path), "rows_done": rows_done, **stats}, f)
+    os.replace(tmp_path, cp_path)
+
+
+# ---------------- Writing ----------------
+def _clean(value):
+    # NaN -> None and numpy scalars -> Python types so rows are JSON serializable
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def _with_retries(fn):
+    for attempt in range(MAX_RETRIES):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            wait = 2 ** attempt
+            print(f"Database Error: {e} (retrying in {wait}s)")
+            time.sleep(wait)
+
+
+def startup_uuid(natural_key):
+    # Dataset IDs (e.g. "ST100000") are not DB UUIDs; map them to a stable one so re-imports upsert
+    return str(uuid.uuid5(STARTUP_ID_NAMESPACE, str(natural_key)))
+
+
+def write_batch(keyed_records, user_id):
+    """
+    Score one batch of (natural_key, PascalCase record) pairs and upsert its startups + SHAP rows.
+    Every step is idempotent, so the whole batch can safely be retried. Returns rows written.
+    """
+    records = [record for _, record in keyed_records]
+    predictions = predict_growth_batch([{col: r[col] for col in ML_COLUMNS} for r in records])
+
+    startup_rows = []
+    for (key, record), (growth_class, _) in zip(keyed_records, predictions):
+        record = dict(record, User_ID=user_id, Growth_Class=growth_class, Startup_ID=startup_uuid(key))
+        startup_rows.append({startup_columns_mapping[k]: record[k] for k in startup_columns_mapping if k in record})
+    startup_ids = [row["startup_id"] for row in startup_rows]
+
+    _with_retries(lambda: supabase.table("startups").upsert(startup_rows, on_conflict="startup_id").execute())
+
+    # Replace (not append) SHAP rows, so a batch written before a crash isn't duplicated on resume
+    for offset in range(0, len(startup_ids), SHAP_DELETE_BATCH_SIZE):
+        ids = startup_ids[offset:offset + SHAP_DELETE_BATCH_SIZE]
+        _with_retries(lambda: supabase.table("shap_results").delete().in_("startup_id", ids).execute())
+    shap_rows = [
+        {"startup_id": startup_id, "feature": feature_name, "shap_value": float(shap_val)}
+        for startup_id, (_, shap_summary) in zip(startup_ids, predictions)
+        for feature_name, shap_val in shap_summary
+    ]
+    if shap_rows:
+        _with_retries(lambda: supabase.table("shap_results").insert(shap_rows).execute())
+    return len(startup_rows)
+
+
+def refresh_api_index(api):
+    # Ask the running API to pick up the imported startups in its recommendation index
+    res = requests.post(f"{api.rstrip('/')}/startup/index/refresh")
+    res.raise_for_status()
+    print(f"API startup index refreshed ({res.json().get('indexed')} startups)")
+
+
+def bulk_import(path, user_id, chunk_size=DEFAULT_CHUNK_SIZE, restart=False, api=None):
+    if restart and os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    rows_done, stats = load_checkpoint(path)
+    if rows_done:
+        print(f"Resuming {path} from row {rows_done}...")
+
+    # Reader thread feeds a bounded queue; when inserts fall behind, put() blocks and reading pauses
+    chunks = queue.Queue(maxsize=MAX_PENDING_CHUNKS)
+    reader_error = []
+
+    def reader():
+        try:
+            for item in iter_chunks(path, chunk_size, skip_rows=rows_done):
+                chunks.put(item)
+        except Exception as e:
+            reader_error.append(e)
+        finally:
+            chunks.put(None)
+
+    threading.Thread(target=reader, daemon=True).start()
+
+    while True:
+        item = chunks.get()
+        if item is None:
+            break
+        start, df = item
+        df = df.rename(columns=lambda c: str(c).strip())
+        missing = [col for col in ML_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing model columns in {path}: {missing}")
+
+        records = [{k: _clean(v) for k, v in r.items()} for r in df.to_dict(orient="records")]
+        # Natural key: the dataset Startup_ID, or the file row number when the file has none
+        source = os.path.basename(path)
+        keyed = [
+            (r.get("Startup_ID") or f"{source}:{start + i}", r)
+            for i, r in enumerate(records)
+        ]
+        for offset in range(0, len(keyed), INSERT_BATCH_SIZE):
+            batch = keyed[offset:offset + INSERT_BATCH_SIZE]
+            # Rows without every model feature can't be scored
+            scorable = [(k, r) for k, r in batch if all(r.get(col) is not None for col in ML_COLUMNS)]
+            # A key may appear only once per upsert ("ON CONFLICT ... cannot affect row a second time"); keep the last
+            scorable = list({k: (k, r) for k, r in scorable}.values())
+            stats["skipped"] += len(batch) - len(scorable)
+            if scorable:
+                stats["inserted"] += write_batch(scorable, user_id)
+            save_checkpoint(path, start + offset + len(batch), stats)
+        print(f"Imported rows up to {start + len(records)} ({stats['inserted']} inserted, {stats['skipped']} skipped)")
+
+    if reader_error:
+        raise reader_error[0]
+
+    if os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+    if api:
+        refresh_api_index(api)
+    else:
+        print("Note: POST /startup/index/refresh on the API (or pass --api) so recommendations include these startups.")
+    print("Done.")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import startups from a CSV/XLSX dataset.")
+    parser.add_argument("path", help="CSV or XLSX file with PascalCase columns (see columns.py)")
+    parser.add_argument("--user-id", required=True, help="user_id that owns the imported startups")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start from row 0")
+    parser.add_argument("--api", help="base URL of the running API; its startup index is refreshed after the import")
+    args = parser.parse_args()
+    bulk_import(args.path, args.user_id, chunk_size=args.chunk_size, restart=args.restart, api=args.api)
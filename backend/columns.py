@@ -0,0 +1,34 @@
+# columns.py
+# Column names shared by the onboarding route and the bulk importer.
+
+# Feature names the model is trained on (frontend / dataset PascalCase)
+ML_COLUMNS = [
+    "Domain",
+    "Startup_Stage",
+    "Industry_Funder_Type",
+    "Investment_Amount",
+    "Valuation",
+    "Number_of_Investors",
+    "Year_Founded"
+]
+
+# Map PascalCase keys to lowercase DB columns
+startup_columns_mapping = {
+    "Startup_ID": "startup_id",
+    "User_ID": "user_id",
+    "Startup_Idea": "startup_idea",
+    "Domain": "domain",
+    "Startup_Stage": "startup_stage",
+    "Industry_Funder_Type": "industry_funder_type",
+    "Project_Duration_Months": "project_duration_months",
+    "SDG_Alignment": "sdg_alignment",
+    "Investment_Amount": "investment_amount",
+    "Valuation": "valuation",
+    "Number_of_Investors": "number_of_investors",
+    "Year_Founded": "year_founded",
+    "Growth_Rate_Cent": "growth_rate_cent",
+    "Country": "country",
+    "Growth_Class": "growth_class",
+    "Project_Status": "project_status",
+    "Funding_Rounds": "funding_rounds"
+}
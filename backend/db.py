@@ -1,4 +1,48 @@
 from supabase import create_client
 from config import SUPABASE_URL, SUPABASE_KEY
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# PostgREST's default max-rows: a single select never returns more than this many rows
+POSTGREST_MAX_ROWS = 1000
+
+
+def iter_table(table, key, columns="*", page_size=1000, filters=None):
+    """
+    Yield every row of `table` using keyset pagination on `key`.
+    Each page is a `key > last_seen ORDER BY key LIMIT page_size` query, so only
+    one page is held in memory and deep pages cost the same as the first one.
+    `filters` is an optional {column: value} dict of equality filters.
+    """
+    last_key = None
+    while True:
+        query = supabase.table(table).select(columns)
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        rows = query.order(key).limit(page_size).execute().data
+        if not rows:
+            return
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_key = rows[-1][key]
+
+
+def select_in(table, column, values, columns="*", order=(), page_size=POSTGREST_MAX_ROWS):
+    """
+    Yield every row of `table` where `column` is in `values`, paging with .range() so results
+    larger than the server's max-rows cap are not silently truncated. `order` must give the
+    rows a stable order (e.g. (column, "feature")) for paging to be consistent.
+    """
+    offset = 0
+    while True:
+        query = supabase.table(table).select(columns).in_(column, list(values))
+        for key in order:
+            query = query.order(key)
+        rows = query.range(offset, offset + page_size - 1).execute().data
+        yield from rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
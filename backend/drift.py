@@ -0,0 +1,155 @@
+# drift.py
+# Input-drift monitoring: compares live predict_growth inputs with the training data profile.
+#
+# train_model.py saves a reference profile (drift_profile.json):
+#   numeric features     -> decile bin edges + the share of training rows in each bin
+#   categorical features -> category frequencies
+# At serving time DriftMonitor only keeps one counter per bin / per known category (plus an
+# "other" bucket), so memory is constant per feature and the report never touches the DB.
+import json
+import threading
+import numpy as np
+
+NUM_BINS = 10
+OTHER = "__other__"
+# Population Stability Index thresholds (common rule of thumb)
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+
+def _bin_index(edges, values):
+    # Outer bins are open-ended so out-of-range live values still land in a bin
+    return np.searchsorted(np.asarray(edges[1:-1]), values, side="right")
+
+
+def build_profile(data, numeric_features, categorical_features):
+    """Build the reference profile from the training DataFrame."""
+    profile = {"numeric": {}, "categorical": {}, "n": int(len(data))}
+    for col in numeric_features:
+        values = data[col].dropna().to_numpy(dtype=float)
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, NUM_BINS + 1)))
+        counts = np.bincount(_bin_index(edges, values), minlength=len(edges) - 1)
+        profile["numeric"][col] = {
+            "edges": edges.tolist(),
+            "proportions": (counts / counts.sum()).tolist(),
+        }
+    for col in categorical_features:
+        freqs = data[col].astype(str).value_counts(normalize=True)
+        profile["categorical"][col] = {str(k): float(v) for k, v in freqs.items()}
+    return profile
+
+
+def save_profile(profile, path):
+    with open(path, "w") as f:
+        json.dump(profile, f)
+
+
+def load_profile(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def psi(expected, actual, eps=1e-4):
+    expected = np.clip(np.asarray(expected, dtype=float), eps, None)
+    actual = np.clip(np.asarray(actual, dtype=float), eps, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _status(score):
+    if score >= PSI_SIGNIFICANT:
+        return "significant"
+    if score >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    """Streaming per-feature counters matched to a reference profile."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.n = 0
+            self._numeric = {
+                col: np.zeros(len(ref["proportions"]), dtype=np.int64)
+                for col, ref in self.profile["numeric"].items()
+            }
+            self._missing = {col: 0 for col in self.profile["numeric"]}
+            self._categorical = {
+                col: dict.fromkeys(list(ref) + [OTHER], 0)
+                for col, ref in self.profile["categorical"].items()
+            }
+
+    def update(self, records):
+        """Fold a batch of model inputs (dicts, PascalCase or snake_case keys) into the counters."""
+        records = [{str(k).lower(): v for k, v in r.items()} for r in records]
+        with self._lock:
+            self.n += len(records)
+            for col, counts in self._numeric.items():
+                values = []
+                for r in records:
+                    try:
+                        values.append(float(r[col]))
+                    except (KeyError, TypeError, ValueError):
+                        self._missing[col] += 1
+                if values:
+                    edges = self.profile["numeric"][col]["edges"]
+                    counts += np.bincount(_bin_index(edges, values), minlength=len(counts))
+            for col, counts in self._categorical.items():
+                for r in records:
+                    value = str(r.get(col))
+                    counts[value if value in counts else OTHER] += 1
+
+    def report(self):
+        with self._lock:
+            features = {}
+            for col, counts in self._numeric.items():
+                ref = np.asarray(self.profile["numeric"][col]["proportions"])
+                total = counts.sum()
+                if not total:
+                    features[col] = {
+                        "type": "numeric",
+                        "n": 0,
+                        "missing": self._missing[col],
+                        "psi": None,
+                        "ks": None,
+                        "status": "no_data",
+                    }
+                    continue
+                live = counts / total
+                score = psi(ref, live)
+                features[col] = {
+                    "type": "numeric",
+                    "n": int(total),
+                    "missing": self._missing[col],
+                    "psi": score,
+                    # KS statistic on the binned CDFs
+                    "ks": float(np.max(np.abs(np.cumsum(live) - np.cumsum(ref)))),
+                    "status": _status(score),
+                }
+            for col, counts in self._categorical.items():
+                ref = self.profile["categorical"][col]
+                total = sum(counts.values())
+                if not total:
+                    features[col] = {"type": "categorical", "n": 0, "psi": None, "unseen_share": None, "status": "no_data"}
+                    continue
+                keys = list(counts)
+                score = psi([ref.get(k, 0.0) for k in keys], [counts[k] / total for k in keys])
+                features[col] = {
+                    "type": "categorical",
+                    "n": total,
+                    "psi": score,
+                    "unseen_share": counts[OTHER] / total,
+                    "status": _status(score),
+                }
+            scored = [f["psi"] for f in features.values() if f["psi"] is not None]
+            return {
+                "n": self.n,
+                "max_psi": max(scored) if scored else None,
+                "status": _status(max(scored)) if scored else "no_data",
+                "features": features,
+            }
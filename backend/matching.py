@@ -0,0 +1,303 @@
+# matching.py
+# In-memory vector index used by /investor/recommend to match investors to startups.
+import math
+import re
+import threading
+import numpy as np
+
+# Known category values (from model/ready_data.csv). Anything else falls into an "other" slot,
+# so the vector layout never changes and startups can be added without re-encoding the index.
+DOMAINS = ["AI", "AgriTech", "Blockchain", "Energy", "Healthcare", "IoT", "Smart Cities", "Sustainability"]
+STAGES = ["Idea", "Prototype", "MVP", "Early Revenue"]
+FUNDER_TYPES = ["Angel Investor", "Corporate R&D", "Government Grant", "VC Firm"]
+NUM_SDGS = 17
+
+# Fixed scaling ranges so every vector lands roughly in [0, 1] regardless of what is already indexed
+LOG_INVESTMENT_RANGE = (math.log1p(1e5), math.log1p(1e10))
+LOG_VALUATION_RANGE = (math.log1p(1e6), math.log1p(1e11))
+MAX_GROWTH_RATE = 200.0
+MAX_INVESTORS = 50.0
+YEAR_RANGE = (2000.0, 2025.0)
+
+# Feature blocks: (name, width). The investor query only weighs the blocks it specifies.
+BLOCKS = [
+    ("domain", len(DOMAINS) + 1),
+    ("startup_stage", len(STAGES) + 1),
+    ("industry_funder_type", len(FUNDER_TYPES) + 1),
+    ("sdg_alignment", NUM_SDGS),
+    ("investment_amount", 1),
+    ("number_of_investors", 1),
+    ("year_founded", 1),
+    ("valuation", 1),
+    ("growth_rate_cent", 1),
+]
+
+# Every query also prefers low valuation and high growth (the original recommendation heuristic).
+# It is the whole score when the investor gives no other features, and a tie-breaker otherwise.
+DEFAULT_PREFERENCE = {"valuation": 0.0, "growth_rate_cent": 1.0}
+DEFAULT_PREFERENCE_WEIGHT = 0.25
+DIM = sum(width for _, width in BLOCKS)
+
+# The only startups columns the index reads; load it with select(INDEX_COLUMNS), not select("*")
+INDEX_COLUMNS = ",".join(["startup_id", "growth_class"] + [name for name, _ in BLOCKS])
+BLOCK_SLICES = {}
+_offset = 0
+for _name, _width in BLOCKS:
+    BLOCK_SLICES[_name] = slice(_offset, _offset + _width)
+    _offset += _width
+
+
+def _one_hot(value, vocab):
+    vec = np.zeros(len(vocab) + 1, dtype=np.float32)
+    vec[vocab.index(value) if value in vocab else len(vocab)] = 1.0
+    return vec
+
+
+def _sdg_vector(value):
+    # Accepts "SDG 9", "SDG 9, SDG 12", [9, 12], ...
+    vec = np.zeros(NUM_SDGS, dtype=np.float32)
+    if value is None:
+        return vec
+    items = value if isinstance(value, (list, tuple)) else [value]
+    for item in items:
+        for num in re.findall(r"\d+", str(item)):
+            if 1 <= int(num) <= NUM_SDGS:
+                vec[int(num) - 1] = 1.0
+    total = vec.sum()
+    return vec / total if total else vec
+
+
+def _scale(value, low, high):
+    return min(max((float(value) - low) / (high - low), 0.0), 1.0)
+
+
+def _encode_block(name, value):
+    if name == "domain":
+        return _one_hot(value, DOMAINS)
+    if name == "startup_stage":
+        return _one_hot(value, STAGES)
+    if name == "industry_funder_type":
+        return _one_hot(value, FUNDER_TYPES)
+    if name == "sdg_alignment":
+        return _sdg_vector(value)
+    if name == "investment_amount":
+        return np.array([_scale(math.log1p(max(float(value), 0.0)), *LOG_INVESTMENT_RANGE)], dtype=np.float32)
+    if name == "number_of_investors":
+        return np.array([_scale(value, 0.0, MAX_INVESTORS)], dtype=np.float32)
+    if name == "year_founded":
+        return np.array([_scale(value, *YEAR_RANGE)], dtype=np.float32)
+    if name == "valuation":
+        return np.array([_scale(math.log1p(max(float(value), 0.0)), *LOG_VALUATION_RANGE)], dtype=np.float32)
+    if name == "growth_rate_cent":
+        return np.array([_scale(value, 0.0, MAX_GROWTH_RATE)], dtype=np.float32)
+    raise KeyError(name)
+
+
+def encode_startup(row):
+    """Encode a startups-table row (lowercase columns) into a DIM-sized vector. Missing fields stay zero."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    for name, _ in BLOCKS:
+        value = row.get(name)
+        if value is None or value == "":
+            continue
+        try:
+            vec[BLOCK_SLICES[name]] = _encode_block(name, value)
+        except (TypeError, ValueError):
+            continue
+    return vec
+
+
+def encode_preferences(prefs):
+    """
+    Encode investor preferences into (query_vector, weights).
+    Only blocks the investor specified get full weight, so unspecified features don't affect the score;
+    valuation and growth always carry DEFAULT_PREFERENCE at a lower weight.
+    """
+    # Investor-facing names -> startup columns
+    aliases = {
+        "domain": ["domain", "preferred_domain"],
+        "startup_stage": ["startup_stage", "preferred_stage"],
+        "industry_funder_type": ["industry_funder_type", "funder_type"],
+        "sdg_alignment": ["sdg_alignment", "sdg_goals"],
+        "investment_amount": ["investment_amount", "ticket_size"],
+        "number_of_investors": ["number_of_investors"],
+        "year_founded": ["year_founded"],
+    }
+    query = np.zeros(DIM, dtype=np.float32)
+    weights = np.zeros(DIM, dtype=np.float32)
+    for name, target in DEFAULT_PREFERENCE.items():
+        query[BLOCK_SLICES[name]] = target
+        weights[BLOCK_SLICES[name]] = DEFAULT_PREFERENCE_WEIGHT
+    for name, keys in aliases.items():
+        value = next((prefs[k] for k in keys if prefs.get(k) not in (None, "")), None)
+        if value is None:
+            continue
+        try:
+            query[BLOCK_SLICES[name]] = _encode_block(name, value)
+        except (TypeError, ValueError):
+            continue
+        weights[BLOCK_SLICES[name]] = 1.0
+    return query, weights
+
+
+class StartupIndex:
+    """
+    Append-only startup vector index with blocked brute-force k-NN search.
+
+    Only the startup_id, the feature vector and the filter columns are kept (full rows are fetched
+    for the top-k by the caller). Vectors live in one contiguous float32 matrix (grown by doubling),
+    and queries scan it in blocks of `block_size` rows: 4096 x 41 float32 is ~670KB, so a block and
+    its per-query temporaries stay in L2. Each block is masked by the filters, scored with two
+    mat-vec products, and its top-k kept with argpartition and merged.
+    A million startups is ~165MB of vectors and ~20MB of filter arrays, plus the id list and
+    id -> position map (~150MB of Python strings/dict entries).
+    """
+
+    def __init__(self, block_size=4096, initial_capacity=1024):
+        self.block_size = block_size
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((initial_capacity, DIM), dtype=np.float32)
+        self._valuation = np.zeros(initial_capacity, dtype=np.float64)
+        self._growth = np.zeros(initial_capacity, dtype=np.float64)
+        self._domain = np.zeros(initial_capacity, dtype=np.int32)
+        self._growth_class = np.zeros(initial_capacity, dtype=np.int8)
+        # Exact string -> code, assigned as new values are seen (domain filter / get())
+        self._domain_codes = {}
+        self._growth_class_codes = {}
+        self._ids = []
+        self._positions = {}
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _grow(self, needed):
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for attr in ("_vectors", "_valuation", "_growth", "_domain", "_growth_class"):
+            old = getattr(self, attr)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self._ids)] = old[:len(self._ids)]
+            setattr(self, attr, new)
+
+    @staticmethod
+    def _code(codes, value):
+        return codes.setdefault(value, len(codes))
+
+    @staticmethod
+    def _decode(codes, code):
+        return next((value for value, c in codes.items() if c == code), None)
+
+    def add(self, row):
+        """Add (or replace, if startup_id is already indexed) a single startup row."""
+        self.add_many([row])
+
+    def add_many(self, rows):
+        with self._lock:
+            for row in rows:
+                startup_id = row.get("startup_id")
+                pos = self._positions.get(startup_id)
+                if pos is None:
+                    pos = len(self._ids)
+                    self._grow(pos + 1)
+                    self._ids.append(startup_id)
+                    if startup_id is not None:
+                        self._positions[startup_id] = pos
+                self._vectors[pos] = encode_startup(row)
+                self._valuation[pos] = float(row.get("valuation") or 0)
+                self._growth[pos] = float(row.get("growth_rate_cent") or 0)
+                self._domain[pos] = self._code(self._domain_codes, row.get("domain"))
+                self._growth_class[pos] = self._code(self._growth_class_codes, row.get("growth_class"))
+
+    def load_once(self, rows_factory):
+        """Bulk-load the index from rows_factory() the first time it is called; later calls are no-ops."""
+        with self._lock:
+            if not self.loaded:
+                self.add_many(rows_factory())
+                self.loaded = True
+        return self
+
+    def refresh(self, rows, page_size=1000):
+        """
+        Upsert every row from `rows` (e.g. after a bulk import). Rows are added a page at a time
+        so queries can run between pages instead of waiting for the whole scan.
+        """
+        page = []
+        for row in rows:
+            page.append(row)
+            if len(page) == page_size:
+                self.add_many(page)
+                page = []
+        self.add_many(page)
+        with self._lock:
+            self.loaded = True
+        return len(self)
+
+    def get(self, startup_id):
+        """Return {startup_id, domain, growth_class} for an indexed startup, or None."""
+        with self._lock:
+            pos = self._positions.get(startup_id)
+            if pos is None:
+                return None
+            return {
+                "startup_id": startup_id,
+                "domain": self._decode(self._domain_codes, self._domain[pos]),
+                "growth_class": self._decode(self._growth_class_codes, self._growth_class[pos]),
+            }
+
+    def query(self, prefs, k=5):
+        """
+        Return the top-k startups for an investor as a list of (startup_id, match_score), best first.
+        Filters: min_valuation, max_valuation, min_growth_rate, domain (exact match).
+        match_score is 1 / (1 + weighted Euclidean distance) over the features the investor specified
+        plus the default low-valuation / high-growth preference.
+        """
+        query, weights = encode_preferences(prefs)
+        wq = weights * query
+        q_norm = float(np.dot(wq, query))
+        min_val = prefs.get("min_valuation") or 0
+        max_val = prefs.get("max_valuation")
+        min_growth = prefs.get("min_growth_rate") or 0
+        domain = prefs.get("domain")
+
+        with self._lock:
+            if domain and domain not in self._domain_codes:
+                return []
+            n = len(self._ids)
+            best_idx = np.empty(0, dtype=np.int64)
+            best_dist = np.empty(0, dtype=np.float32)
+            for start in range(0, n, self.block_size):
+                stop = min(start + self.block_size, n)
+
+                mask = self._valuation[start:stop] >= min_val
+                if max_val is not None:
+                    mask &= self._valuation[start:stop] <= max_val
+                if min_growth:
+                    mask &= self._growth[start:stop] >= min_growth
+                if domain:
+                    mask &= self._domain[start:stop] == self._domain_codes[domain]
+                candidates = np.flatnonzero(mask)
+                if candidates.size == 0:
+                    continue
+
+                # ||x - q||^2_w = x.(w*x) - 2 x.(w*q) + q.(w*q)
+                sub = self._vectors[start:stop][candidates]
+                dist = (sub * sub) @ weights - 2.0 * (sub @ wq) + q_norm
+                if candidates.size > k:
+                    top = np.argpartition(dist, k)[:k]
+                    candidates, dist = candidates[top], dist[top]
+
+                best_idx = np.concatenate([best_idx, candidates + start])
+                best_dist = np.concatenate([best_dist, dist.astype(np.float32)])
+                if best_idx.size > k:
+                    top = np.argpartition(best_dist, k)[:k]
+                    best_idx, best_dist = best_idx[top], best_dist[top]
+
+            order = np.argsort(best_dist, kind="stable")
+            return [
+                (self._ids[best_idx[i]], float(1.0 / (1.0 + math.sqrt(max(float(best_dist[i]), 0.0)))))
+                for i in order
+            ]
@@ -1,49 +1,217 @@
 # ml_service.py
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import pandas as pd
 import numpy as np
-from model_loader import pipeline, explainer
+from model_loader import pipeline, explainer, drift_profile
+from drift import DriftMonitor
+from config import PREDICTION_BATCH_WINDOW_MS, PREDICTION_MAX_BATCH_SIZE, PREDICTION_TIMEOUT_SECONDS
+from columns import ML_COLUMNS
 
 CLASSES = ["Low", "Medium", "High"]
 
+# Streaming input-drift counters (None if the model was trained without a drift profile)
+drift_monitor = DriftMonitor(drift_profile) if drift_profile else None
+
+def validate_record(record):
+    # Stacking rows into one DataFrame would silently fill a missing feature with NaN
+    missing = [col for col in ML_COLUMNS if col not in record]
+    if missing:
+        raise ValueError(f"Missing model features: {missing}")
+
 def predict_growth(data):
-    # Convert input dict to DataFrame
-    df = pd.DataFrame([data])
+    validate_record(data)
+    # Concurrent callers are coalesced into one predict_growth_batch call (see PredictionBatcher)
+    return batcher.submit(data)
+
+def predict_growth_batch(records):
+    for record in records:
+        validate_record(record)
+    # Convert input dicts to one DataFrame so preprocessing, prediction and SHAP run once per batch
+    df = pd.DataFrame(records)
     # Standardize columns to match training data (snake_case)
     #df.columns = [col.replace(' ', '_').lower() for col in df.columns]
-    
+
     # Extract preprocessor and model from pipeline
     # Assuming pipeline steps: [('preprocessor', ...), ('classifier', ...)]
     preprocessor = pipeline.named_steps['preprocessor']
     model = pipeline.named_steps['classifier']
-    
+
     # Preprocess data
     X_transformed = preprocessor.transform(df)
-    
+
     # Predict Class
-    pred_idx = model.predict(X_transformed)[0]
-    growth_class = CLASSES[pred_idx] if pred_idx < len(CLASSES) else "Unknown"
-    
+    pred_idx = model.predict(X_transformed)
+
     # Compute SHAP values
     # For classification, shap_values is a list of arrays (one for each class)
     shap_values = explainer.shap_values(X_transformed)
-    
-    # Get SHAP values for the predicted class
-    # Handle different return types from SHAP (list of arrays vs array)
-    if isinstance(shap_values, list):
-        class_shap_values = shap_values[pred_idx]
-    elif len(np.array(shap_values).shape) == 3:
-        class_shap_values = shap_values[:, :, pred_idx]
-    else:
-        class_shap_values = shap_values
-
-    # Ensure it is a 1D array for the single sample
-    class_shap_values = np.array(class_shap_values).flatten()
-    
+
     # Get feature names from the preprocessor step in the pipeline
     try:
         feature_names = preprocessor.get_feature_names_out()
     except Exception:
         feature_names = [f"feature_{i}" for i in range(X_transformed.shape[1])]
-    shap_summary = sorted(zip(feature_names, class_shap_values), key=lambda x: abs(x[1]), reverse=True)[:5]
 
-    return growth_class, shap_summary
+    results = []
+    for row, idx in enumerate(pred_idx):
+        growth_class = CLASSES[idx] if idx < len(CLASSES) else "Unknown"
+
+        # Get SHAP values for the predicted class
+        # Handle different return types from SHAP (list of arrays vs array)
+        if isinstance(shap_values, list):
+            class_shap_values = shap_values[idx][row]
+        elif len(np.array(shap_values).shape) == 3:
+            class_shap_values = shap_values[row, :, idx]
+        else:
+            class_shap_values = shap_values[row]
+
+        # Ensure it is a 1D array for the single sample
+        class_shap_values = np.array(class_shap_values).flatten()
+        shap_summary = sorted(zip(feature_names, class_shap_values), key=lambda x: abs(x[1]), reverse=True)[:5]
+        results.append((growth_class, shap_summary))
+
+    # Only successfully scored inputs count towards drift (a failed batch is retried row by row)
+    if drift_monitor is not None:
+        drift_monitor.update(records)
+    return results
+
+
+class PredictionTimeoutError(Exception):
+    """Raised by predict_growth when a batched prediction doesn't finish in PREDICTION_TIMEOUT_SECONDS."""
+
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent single-row predictions into batches.
+
+    The first queued request opens a window of `window_ms`; everything that arrives before it
+    closes (up to `max_batch_size` rows) is scored with one predict_fn call on a background
+    thread, and each caller gets its own row back. Added latency is bounded by the window.
+    """
+
+    def __init__(self, predict_fn, window_ms, max_batch_size):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._metrics = {
+            "requests": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "batch_size_histogram": {},
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_predict_ms": 0.0,
+            "timeouts": 0,
+        }
+
+    def submit(self, record):
+        if self.window <= 0 or self.max_batch_size <= 1:
+            return self.predict_fn([record])[0]
+        self._ensure_started()
+        future = Future()
+        self._queue.put((record, future, time.monotonic()))
+        try:
+            return future.result(timeout=PREDICTION_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # Cancel so the worker skips it; if it is already being scored, its result is just dropped
+            future.cancel()
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise PredictionTimeoutError(f"Prediction timed out after {PREDICTION_TIMEOUT_SECONDS}s")
+
+    def _ensure_started(self):
+        # Also restarts the worker if it ever died
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Never leave a caller waiting on a batch the worker gave up on
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _process(self, batch):
+        # Drop requests whose caller already timed out; the rest can no longer be cancelled
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.monotonic()
+        records = [record for record, _, _ in batch]
+        try:
+            results = self.predict_fn(records)
+            if len(results) != len(records):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(records)} rows")
+        except Exception:
+            # Don't let one bad row fail the whole batch: retry rows individually
+            results = None
+        finished = time.monotonic()
+
+        for i, (record, future, queued_at) in enumerate(batch):
+            if future.done():
+                continue
+            if results is not None:
+                future.set_result(results[i])
+                continue
+            try:
+                future.set_result(self.predict_fn([record])[0])
+            except Exception as e:
+                future.set_exception(e)
+
+        self._record(batch, started, finished)
+
+    def _record(self, batch, started, finished):
+        size = len(batch)
+        # Power-of-two buckets: "1", "2", "3-4", "5-8", ...
+        upper = 1 << (size - 1).bit_length()
+        bucket = str(size) if upper <= 2 else f"{upper // 2 + 1}-{upper}"
+        waits = [(started - queued_at) * 1000 for _, _, queued_at in batch]
+        with self._lock:
+            m = self._metrics
+            m["requests"] += size
+            m["batches"] += 1
+            m["max_batch_size"] = max(m["max_batch_size"], size)
+            m["batch_size_histogram"][bucket] = m["batch_size_histogram"].get(bucket, 0) + 1
+            m["total_wait_ms"] += sum(waits)
+            m["max_wait_ms"] = max(m["max_wait_ms"], max(waits))
+            m["total_predict_ms"] += (finished - started) * 1000
+
+    def metrics(self):
+        with self._lock:
+            m = dict(self._metrics, batch_size_histogram=dict(self._metrics["batch_size_histogram"]))
+        batches = m["batches"] or 1
+        requests = m["requests"] or 1
+        m["mean_batch_size"] = m["requests"] / batches
+        m["mean_wait_ms"] = m.pop("total_wait_ms") / requests
+        m["mean_predict_ms"] = m.pop("total_predict_ms") / batches
+        m["window_ms"] = self.window * 1000
+        m["max_batch_size_limit"] = self.max_batch_size
+        return m
+
+
+batcher = PredictionBatcher(predict_growth_batch, PREDICTION_BATCH_WINDOW_MS, PREDICTION_MAX_BATCH_SIZE)
@@ -1,10 +1,12 @@
 # Loads saved models.
 import joblib
 import os
+from drift import load_profile
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "ml_pipeline.pkl")
 EXPLAINER_PATH = os.path.join(BASE_DIR, "shap_explainer.pkl")
+DRIFT_PROFILE_PATH = os.path.join(BASE_DIR, "drift_profile.json")
 
 if not os.path.exists(MODEL_PATH) or not os.path.exists(EXPLAINER_PATH):
     raise FileNotFoundError(
@@ -14,3 +16,8 @@ if not os.path.exists(MODEL_PATH) or not os.path.exists(EXPLAINER_PATH):
 
 pipeline = joblib.load(MODEL_PATH)
 explainer = joblib.load(EXPLAINER_PATH)
+
+# Drift profile is optional: models trained before it existed just run without drift monitoring
+drift_profile = None
+if os.path.exists(DRIFT_PROFILE_PATH):
+    drift_profile = load_profile(DRIFT_PROFILE_PATH)
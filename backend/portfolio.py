@@ -0,0 +1,134 @@
+# portfolio.py
+# Investment aggregates maintained at write time, so portfolio views never scan the investments table.
+#
+#   per investor: startups backed, investment count, startups backed by domain and by growth class
+#   per startup:  distinct investor count, investment count, last transaction
+#
+# /invest/trigger calls record() after each written investment; rebuild() recomputes everything
+# from the investments ledger (on first use, or via POST /portfolio/rebuild). Investments recorded
+# while a rebuild is scanning the ledger are held and replayed into the rebuilt state, skipping any
+# the scan already saw. Every investment_id is applied at most once, so no write is lost or double counted.
+import threading
+from db import iter_table
+
+
+class PortfolioAggregates:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._investors = {}
+        self._startups = {}
+        self._applied = set()   # investment_ids already folded in
+        self._pending = None    # investments recorded during a rebuild
+        self.loaded = False
+
+    def record(self, investment, startup=None):
+        """Fold a newly written investments row in. `startup` supplies domain / growth_class."""
+        if investment.get("status", "Success") != "Success":
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((investment, startup))
+            # Before the first load there is nothing to update: the load reads this row from the ledger
+            if self.loaded:
+                self._apply(investment, startup)
+
+    def _apply(self, investment, startup=None):
+        # Caller holds self._lock (or owns a private instance being rebuilt)
+        investment_id = investment.get("investment_id")
+        if investment_id in self._applied:
+            return
+        if investment_id is not None:
+            self._applied.add(investment_id)
+        startup = startup or {}
+        investor_id = investment["investor_id"]
+        startup_id = investment["startup_id"]
+        inv = self._investors.setdefault(investor_id, {
+            "startups": set(), "investment_count": 0, "by_domain": {}, "by_growth_class": {},
+        })
+        inv["investment_count"] += 1
+        # Domain / growth class counts are per distinct startup backed
+        if startup_id not in inv["startups"]:
+            inv["startups"].add(startup_id)
+            for key, field in (("by_domain", "domain"), ("by_growth_class", "growth_class")):
+                value = startup.get(field) or "Unknown"
+                inv[key][value] = inv[key].get(value, 0) + 1
+
+        st = self._startups.setdefault(startup_id, {
+            "investors": set(), "investment_count": 0, "last_transaction": None,
+        })
+        st["investors"].add(investor_id)
+        st["investment_count"] += 1
+        last = st["last_transaction"]
+        at = investment.get("created_at")
+        # Ledger rows may arrive out of order during a rebuild; keep the newest by timestamp
+        if last is None or not (at and last["created_at"]) or at >= last["created_at"]:
+            st["last_transaction"] = {
+                "investment_id": investment.get("investment_id"),
+                "investor_id": investor_id,
+                "tx_hash": investment.get("tx_hash"),
+                "status": investment.get("status"),
+                "created_at": at,
+            }
+
+    def investor_summary(self, investor_id):
+        with self._lock:
+            inv = self._investors.get(investor_id)
+            if inv is None:
+                return None
+            return {
+                "investor_id": investor_id,
+                "startups_backed": len(inv["startups"]),
+                "startup_ids": sorted(inv["startups"]),
+                "investment_count": inv["investment_count"],
+                "by_domain": dict(inv["by_domain"]),
+                "by_growth_class": dict(inv["by_growth_class"]),
+            }
+
+    def startup_summary(self, startup_id):
+        with self._lock:
+            st = self._startups.get(startup_id)
+            if st is None:
+                return None
+            return {
+                "startup_id": startup_id,
+                "investor_count": len(st["investors"]),
+                "investment_count": st["investment_count"],
+                "last_transaction": dict(st["last_transaction"]) if st["last_transaction"] else None,
+            }
+
+    def rebuild(self, only_if_unloaded=False):
+        """Recompute all aggregates from the investments ledger and the startups table."""
+        with self._rebuild_lock:
+            if only_if_unloaded and self.loaded:
+                return None
+            with self._lock:
+                self._pending = []
+            try:
+                startups = {
+                    row["startup_id"]: row
+                    for row in iter_table("startups", "startup_id", columns="startup_id,domain,growth_class")
+                }
+                fresh = PortfolioAggregates()
+                for investment in iter_table("investments", "investment_id"):
+                    if investment.get("status", "Success") != "Success":
+                        continue
+                    fresh._apply(investment, startups.get(investment["startup_id"]))
+
+                # Swap in the rebuilt state in one step so readers never see a half-built view,
+                # replaying writes the keyset scan had already passed (_apply skips ones it saw)
+                with self._lock:
+                    for investment, startup in self._pending:
+                        fresh._apply(investment, startup)
+                    self._investors, self._startups, self._applied = fresh._investors, fresh._startups, fresh._applied
+                    self.loaded = True
+                return len(fresh._applied)
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def load_once(self):
+        if not self.loaded:
+            self.rebuild(only_if_unloaded=True)
+        return self
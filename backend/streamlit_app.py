@@ -190,6 +190,7 @@ else:
 
         if st.button("📊 Get AI Recommendations"):
             res = requests.post(f"{API}/investor/recommend", json={
+                "user_id": st.session_state["user_id"],
                 "domain": pref_domain,
                 "min_valuation": min_val,
                 "max_valuation": max_val,
@@ -1,13 +1,22 @@
 import pandas as pd
 import numpy as np
 import os
+import json
+import time
+import random
+import argparse
+import itertools
+import queue
+import multiprocessing
 import joblib
 import shap
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.metrics import accuracy_score, f1_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
+from drift import build_profile, save_profile
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,13 +24,178 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "../model/ready_data.csv") 
 MODEL_PATH = os.path.join(BASE_DIR, "ml_pipeline.pkl")
 EXPLAINER_PATH = os.path.join(BASE_DIR, "shap_explainer.pkl")
+DRIFT_PROFILE_PATH = os.path.join(BASE_DIR, "drift_profile.json")
+SEARCH_RESULTS_PATH = os.path.join(BASE_DIR, "search_results.json")
 
-def train_and_save():
+# Hyperparameter search space (--search)
+PREPROCESSING_SPACE = {
+    "scaler": ["standard", "passthrough"],
+    "min_frequency": [None, 0.01],
+}
+FOREST_SPACE = {
+    "max_depth": [None, 8, 16, 32],
+    "min_samples_leaf": [1, 2, 5, 10],
+    "max_features": ["sqrt", "log2", 0.5],
+    "class_weight": [None, "balanced"],
+}
+# Successive halving: n_estimators is the budget resource, multiplied by ETA each rung
+MIN_ESTIMATORS = 25
+MAX_ESTIMATORS = 225
+ETA = 3
+CV_FOLDS = 3
+
+def build_preprocessor(numeric_features, categorical_features, scaler="standard", min_frequency=None):
+    # StandardScaler for numeric, OneHotEncoder for categorical
+    if min_frequency is None:
+        encoder = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
+    else:
+        encoder = OneHotEncoder(handle_unknown='infrequent_if_exist', min_frequency=min_frequency, sparse_output=False)
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler() if scaler == "standard" else 'passthrough', numeric_features),
+            ('cat', encoder, categorical_features)
+        ]
+    )
+
+def _grid(space):
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+# ---------------- Search workers ----------------
+# Preprocessed folds are built once in the parent and shipped to each worker process once.
+_FOLD_CACHE = None
+
+def _init_worker(fold_cache):
+    global _FOLD_CACHE
+    _FOLD_CACHE = fold_cache
+
+def _evaluate(candidate_id, prep_key, forest_params, n_estimators):
+    started = time.time()
+    scores = []
+    for X_fit, y_fit, X_val, y_val in _FOLD_CACHE[prep_key]:
+        model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=1, **forest_params)
+        model.fit(X_fit, y_fit)
+        scores.append(accuracy_score(y_val, model.predict(X_val)))
+    return candidate_id, float(np.mean(scores)), time.time() - started
+
+def search_hyperparameters(X, y, numeric_features, categorical_features, budget_seconds, workers=None, n_candidates=24):
+    """
+    Successive-halving search over preprocessing + forest options within a wall-clock budget.
+    Every candidate starts with MIN_ESTIMATORS trees; the best 1/ETA of each rung moves on with
+    ETA times more trees. The budget is hard: when it runs out, the worker pool is terminated
+    (killing fits still running) and the winner is the best candidate of the last rung in which
+    every candidate finished, or of the partial first rung if none did.
+    """
+    started = time.time()
+    deadline = started + budget_seconds
+
+    # 1. Cache preprocessed CV folds per preprocessing option
+    print("Preprocessing CV folds...")
+    prep_options = _grid(PREPROCESSING_SPACE)
+    folds = list(StratifiedKFold(n_splits=CV_FOLDS, shuffle=True, random_state=42).split(X, y))
+    fold_cache = {}
+    for prep_key, prep in enumerate(prep_options):
+        fold_cache[prep_key] = []
+        for fit_idx, val_idx in folds:
+            preprocessor = build_preprocessor(numeric_features, categorical_features, **prep)
+            X_fit = preprocessor.fit_transform(X.iloc[fit_idx])
+            X_val = preprocessor.transform(X.iloc[val_idx])
+            fold_cache[prep_key].append((X_fit, y.iloc[fit_idx].to_numpy(), X_val, y.iloc[val_idx].to_numpy()))
+    preprocess_seconds = time.time() - started
+
+    # 2. Sample candidates
+    space = [(p, f) for p in range(len(prep_options)) for f in _grid(FOREST_SPACE)]
+    candidates = random.Random(42).sample(space, min(n_candidates, len(space)))
+
+    # 3. Successive halving rungs
+    survivors = list(range(len(candidates)))
+    n_estimators = MIN_ESTIMATORS
+    results = {}            # candidate_id -> (n_estimators, score) at its last evaluated rung
+    completed_rung = None   # (n_estimators, {candidate_id: score}) of the last fully evaluated rung
+    partial_rung = None
+    rungs = []
+    finished = queue.Queue()
+    # multiprocessing.Pool rather than ProcessPoolExecutor: terminate() lets us enforce the budget
+    pool = multiprocessing.Pool(processes=workers, initializer=_init_worker, initargs=(fold_cache,))
+    try:
+        while survivors and time.time() < deadline:
+            rung_started = time.time()
+            for c in survivors:
+                pool.apply_async(
+                    _evaluate, (c, candidates[c][0], candidates[c][1], n_estimators),
+                    callback=finished.put, error_callback=finished.put,
+                )
+            rung_scores = {}
+            fit_seconds = 0.0
+            while len(rung_scores) < len(survivors):
+                try:
+                    item = finished.get(timeout=max(deadline - time.time(), 0.01))
+                except queue.Empty:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                candidate_id, score, seconds = item
+                rung_scores[candidate_id] = score
+                results[candidate_id] = (n_estimators, score)
+                fit_seconds += seconds
+            rungs.append({
+                "n_estimators": n_estimators,
+                "candidates": len(survivors),
+                "completed": len(rung_scores),
+                "best_score": max(rung_scores.values()) if rung_scores else None,
+                "wall_seconds": time.time() - rung_started,
+                "fit_seconds": fit_seconds,
+            })
+            print(f"Rung n_estimators={n_estimators}: {len(rung_scores)}/{len(survivors)} evaluated")
+            if len(rung_scores) < len(survivors):
+                partial_rung = (n_estimators, rung_scores)
+                break
+            completed_rung = (n_estimators, rung_scores)
+            if n_estimators >= MAX_ESTIMATORS:
+                break
+            ranked = sorted(rung_scores, key=rung_scores.get, reverse=True)
+            survivors = ranked[:max(1, len(ranked) // ETA)]
+            n_estimators = min(n_estimators * ETA, MAX_ESTIMATORS)
+    finally:
+        # Kill fits still running instead of waiting for them past the budget
+        pool.terminate()
+        pool.join()
+
+    # Only compare candidates evaluated with the same number of trees
+    winning_rung = completed_rung or partial_rung
+    if not winning_rung or not winning_rung[1]:
+        raise RuntimeError(f"No candidate finished within the {budget_seconds}s search budget")
+    best_estimators, best_scores = winning_rung
+    best_id = max(best_scores, key=best_scores.get)
+    prep_key, forest_params = candidates[best_id]
+    total_seconds = time.time() - started
+    return {
+        "preprocessing": prep_options[prep_key],
+        "forest": dict(forest_params, n_estimators=best_estimators),
+        "cv_accuracy": best_scores[best_id],
+        "candidates": [
+            {"preprocessing": prep_options[candidates[c][0]], "forest": candidates[c][1],
+             "n_estimators": r[0], "cv_accuracy": r[1]}
+            for c, r in sorted(results.items(), key=lambda item: item[1], reverse=True)
+        ],
+        "timings": {
+            "budget_seconds": budget_seconds,
+            "preprocess_seconds": preprocess_seconds,
+            "total_seconds": total_seconds,
+            "budget_overrun_seconds": max(total_seconds - budget_seconds, 0.0),
+            "rungs": rungs,
+        },
+    }
+
+def train_and_save(search=False, budget_seconds=300, workers=None, n_candidates=24):
     # Clean up old artifacts to ensure fresh training
     if os.path.exists(MODEL_PATH):
         os.remove(MODEL_PATH)
     if os.path.exists(EXPLAINER_PATH):
         os.remove(EXPLAINER_PATH)
+    # Results of an earlier --search would no longer describe the saved pipeline
+    if os.path.exists(SEARCH_RESULTS_PATH):
+        os.remove(SEARCH_RESULTS_PATH)
 
     print(f"Loading data from {DATA_PATH}...")
     if not os.path.exists(DATA_PATH):
@@ -44,19 +218,37 @@ def train_and_save():
     X = data[numeric_features + categorical_features]
     y = data['growth_class_label']
 
-    # 3. Build Preprocessing Pipeline
-    # StandardScaler for numeric, OneHotEncoder for categorical
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', StandardScaler(), numeric_features),
-            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features)
-        ]
-    )
+    # 3. Choose Configuration (defaults, or successive-halving search on a training split)
+    preprocessing_params = {}
+    forest_params = {"n_estimators": 100}
+    search_results = None
+    if search:
+        X_train, X_holdout, y_train, y_holdout = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+        print(f"Searching hyperparameters (budget {budget_seconds}s)...")
+        search_results = search_hyperparameters(
+            X_train, y_train, numeric_features, categorical_features, budget_seconds, workers, n_candidates
+        )
+        preprocessing_params = search_results["preprocessing"]
+        forest_params = search_results["forest"]
+        print(f"Best configuration: {preprocessing_params} {forest_params} (CV accuracy {search_results['cv_accuracy']:.4f})")
+
+        # Score the winner on the untouched holdout split
+        holdout_pipeline = Pipeline(steps=[
+            ('preprocessor', build_preprocessor(numeric_features, categorical_features, **preprocessing_params)),
+            ('classifier', RandomForestClassifier(random_state=42, n_jobs=-1, **forest_params))
+        ])
+        holdout_pipeline.fit(X_train, y_train)
+        y_pred = holdout_pipeline.predict(X_holdout)
+        search_results["holdout"] = {
+            "accuracy": float(accuracy_score(y_holdout, y_pred)),
+            "f1_macro": float(f1_score(y_holdout, y_pred, average="macro")),
+        }
+        print(f"Holdout accuracy {search_results['holdout']['accuracy']:.4f}")
 
-    # 4. Full Pipeline with Classifier
+    # 4. Full Pipeline with Classifier (refit on all data)
     pipeline = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
+        ('preprocessor', build_preprocessor(numeric_features, categorical_features, **preprocessing_params)),
+        ('classifier', RandomForestClassifier(random_state=42, n_jobs=-1 if search else None, **forest_params))
     ])
 
     print("Training model...")
@@ -74,7 +266,18 @@ def train_and_save():
     print(f"Saving artifacts to {BASE_DIR}...")
     joblib.dump(pipeline, MODEL_PATH)
     joblib.dump(explainer, EXPLAINER_PATH)
+    # Reference input profile for drift monitoring (see drift.py)
+    save_profile(build_profile(X, numeric_features, categorical_features), DRIFT_PROFILE_PATH)
+    if search_results is not None:
+        with open(SEARCH_RESULTS_PATH, "w") as f:
+            json.dump(search_results, f, indent=2)
     print("Done.")
 
 if __name__ == "__main__":
-    train_and_save()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the growth-class model and SHAP explainer.")
+    parser.add_argument("--search", action="store_true", help="run successive-halving hyperparameter search first")
+    parser.add_argument("--budget", type=float, default=300, help="search wall-clock budget in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="search worker processes (default: all cores)")
+    parser.add_argument("--candidates", type=int, default=24, help="number of sampled search candidates")
+    args = parser.parse_args()
+    train_and_save(search=args.search, budget_seconds=args.budget, workers=args.workers, n_candidates=args.candidates)
\ No newline at end of file